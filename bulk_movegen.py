@@ -0,0 +1,83 @@
+"""
+Move generation over batches of positions.
+Every bitboard is a NumPy uint64 array with one entry per position, so each shift and mask runs over the whole batch at once.
+Meant for perft and self-play data, a single position is faster with the integer generator in movegen.
+Covers the pieces whose targets are plain shifts: pawns, knights and kings.
+"""
+
+import numpy as np
+
+# Local imports
+from move import PIECE_NAMES
+from movegen import BLACK_PUSH_ROW, FILE_A, FILE_H, WHITE_PUSH_ROW
+
+NOT_FILE_A = np.uint64(~FILE_A & ((1 << 64) - 1))
+NOT_FILE_H = np.uint64(~FILE_H & ((1 << 64) - 1))
+NOT_FILE_AB = np.uint64(~(FILE_A | FILE_A << 1) & ((1 << 64) - 1))
+NOT_FILE_GH = np.uint64(~(FILE_H | FILE_H >> 1) & ((1 << 64) - 1))
+WHITE_PUSH_ROW_BB = np.uint64(WHITE_PUSH_ROW)
+BLACK_PUSH_ROW_BB = np.uint64(BLACK_PUSH_ROW)
+
+# (square offset, mask removing targets that wrapped around the board edge)
+KNIGHT_SHIFTS = (
+	(-17, NOT_FILE_H), (-15, NOT_FILE_A), (-10, NOT_FILE_GH), (-6, NOT_FILE_AB),
+	(6, NOT_FILE_GH), (10, NOT_FILE_AB), (15, NOT_FILE_H), (17, NOT_FILE_A),
+)
+KING_SHIFTS = (
+	(-9, NOT_FILE_H), (-8, None), (-7, NOT_FILE_A), (-1, NOT_FILE_H),
+	(1, NOT_FILE_A), (7, NOT_FILE_H), (8, None), (9, NOT_FILE_A),
+)
+
+
+def shift(bb, offset):
+	"""Moves every square of the bitboards offset squares, positive towards h1. Bits pushed off the board are dropped."""
+	if offset > 0:
+		return bb << np.uint64(offset)
+	return bb >> np.uint64(-offset)
+
+
+def batch_bitboards(states):
+	"""Collects the bitboards of a list of GameStates into a dict of uint64 arrays, with 'occ_w' and 'occ_b' added"""
+	batch = {piece: np.array([gs.bb[piece] for gs in states], dtype=np.uint64) for piece in PIECE_NAMES[1:]}
+	batch["occ_w"] = np.array([gs.occ_w for gs in states], dtype=np.uint64)
+	batch["occ_b"] = np.array([gs.occ_b for gs in states], dtype=np.uint64)
+	return batch
+
+
+def pawn_pushes(pawns, occ, white):
+	"""Returns the bitboards of single and double push targets"""
+	empty = ~occ
+	if white:
+		single = (pawns >> np.uint64(8)) & empty
+		double = ((single & WHITE_PUSH_ROW_BB) >> np.uint64(8)) & empty
+	else:
+		single = (pawns << np.uint64(8)) & empty
+		double = ((single & BLACK_PUSH_ROW_BB) << np.uint64(8)) & empty
+	return single, double
+
+
+def pawn_attacks(pawns, white):
+	"""Returns the bitboards of all squares attacked by the pawns"""
+	# Captures to the left can't wrap onto the h-file, captures to the right can't wrap onto the a-file
+	if white:
+		return (shift(pawns, -9) & NOT_FILE_H) | (shift(pawns, -7) & NOT_FILE_A)
+	return (shift(pawns, 7) & NOT_FILE_H) | (shift(pawns, 9) & NOT_FILE_A)
+
+
+def shift_attacks(pieces, shifts):
+	"""ORs together the pieces shifted by every offset, masking off targets that wrapped"""
+	attacks = np.zeros_like(pieces)
+	for offset, mask in shifts:
+		targets = shift(pieces, offset)
+		attacks |= targets if mask is None else targets & mask
+	return attacks
+
+
+def knight_attacks(knights):
+	"""Returns the bitboards of all squares attacked by the knights"""
+	return shift_attacks(knights, KNIGHT_SHIFTS)
+
+
+def king_attacks(kings):
+	"""Returns the bitboards of all squares attacked by the kings"""
+	return shift_attacks(kings, KING_SHIFTS)
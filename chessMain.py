@@ -10,6 +10,7 @@ from loguru import logger
 # Local imports
 from engine import GameState
 from move import Move
+from movegen import iter_bits
 
 WIDTH = HEIGHT = 512
 DIMENSION = 8
@@ -17,39 +18,54 @@ DIMENSION = 8
 SQUARE_SIZE = HEIGHT // DIMENSION
 MAX_FPS = 15
 IMAGES = {}
+# Pre-rendered checkered board, the pattern never changes
+BOARD_SURFACE = None
 
 
 def load_images():
 	"""
 	Loads all piece images into a dict.
 	Format {piece_name: piece_image}
+	Needs the display to be set, as the images are converted to its pixel format.
 	"""
 	pieces = ["bP", "bR", "bN", "bB", "bQ", "bK", "wP", "wR", "wN", "wB", "wQ", "wK"]
 	for piece in pieces:
-		IMAGES[piece] = pygame.transform.scale(pygame.image.load(f"pieces/{piece}.png"), (SQUARE_SIZE, SQUARE_SIZE))
+		IMAGES[piece] = pygame.transform.scale(pygame.image.load(f"pieces/{piece}.png"), (SQUARE_SIZE, SQUARE_SIZE)).convert_alpha()
 
 
-def draw_board(screen):
+def build_board_surface():
 	"""
-	Responsible for drawing the board.
+	Renders the board squares once into a surface.
+	Needs the display to be set, as the surface is converted to its pixel format.
 	"""
+	global BOARD_SURFACE
 	WHITE, BLACK = (235, 235, 208), (119, 148, 85)
+	surface = pygame.Surface((WIDTH, HEIGHT))
 	for row_no in range(DIMENSION):
 		for col_no in range(DIMENSION):
 			is_white = (row_no + col_no) % 2 == 0
 			square_colour = WHITE if is_white else BLACK
-			pygame.draw.rect(screen, square_colour, pygame.Rect(col_no*SQUARE_SIZE, row_no*SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+			pygame.draw.rect(surface, square_colour, pygame.Rect(col_no*SQUARE_SIZE, row_no*SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+	BOARD_SURFACE = surface.convert()
+
+
+def draw_board(screen):
+	"""
+	Responsible for drawing the board.
+	"""
+	screen.blit(BOARD_SURFACE, (0, 0))
 
 
-def draw_pieces(screen, board):
+def draw_pieces(screen, gs):
 	"""
 	Responsible for drawing the pieces on the board from current game state.
+	Only visits occupied squares, and hands all pieces to pygame in one call.
 	"""
-	for row_no in range(DIMENSION):
-		for col_no in range(DIMENSION):
-			piece = board[row_no][col_no]
-			if piece:
-				screen.blit(IMAGES[piece], pygame.Rect(col_no*SQUARE_SIZE, row_no*SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+	blits = []
+	for sq in iter_bits(gs.occ_all):
+		row_no, col_no = divmod(sq, DIMENSION)
+		blits.append((IMAGES[gs.piece_at(sq)], (col_no*SQUARE_SIZE, row_no*SQUARE_SIZE)))
+	screen.blits(blits, doreturn=False)
 
 
 def draw_game_state(screen, gs):
@@ -57,7 +73,7 @@ def draw_game_state(screen, gs):
 	Responsible for all graphics within a game state.
 	"""
 	draw_board(screen)
-	draw_pieces(screen, gs.board)
+	draw_pieces(screen, gs)
 
 
 def main():
@@ -72,11 +88,14 @@ def main():
 	screen.fill(pygame.Color("white"))
 	gs = GameState()
 	load_images()
+	build_board_surface()
 
 	running = True
 	# Flag for when a move is made, triggers get_valid_moves-call
 	move_made = False
 	valid_moves = gs.get_valid_moves()
+	# Valid moves by move_id, for looking up the move matching the player's clicks
+	valid_move_index = {move.move_id: move for move in valid_moves}
 	# Keeps track og last clicked square: (x, y)
 	selected_square = ()
 	# Keeps track of player clicks: [(x, y), (x, y)]
@@ -99,8 +118,9 @@ def main():
 					player_clicks.append(selected_square)
 				if len(player_clicks) == 2:
 					move = Move(gs.board, player_clicks[0], player_clicks[1])
-					if move in valid_moves:
-						move = valid_moves[valid_moves.index(move)]
+					valid_move = valid_move_index.get(move.move_id)
+					if valid_move:
+						move = valid_move
 						gs.make_move(move)
 						move_made = True
 						selected_square = ()
@@ -118,6 +138,7 @@ def main():
 
 		if move_made:
 			valid_moves = gs.get_valid_moves()
+			valid_move_index = {move.move_id: move for move in valid_moves}
 			move_made = False
 		if gs.stalemate or gs.checkmate:
 			running = False
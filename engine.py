@@ -4,287 +4,363 @@ Responsible for determining valid moves in a state.
 Keeps move-logs
 """
 
-import numpy as np
+import random
 
 # Local imports
-from move import Move
+from magics import MASK_64, bishop_attacks, rook_attacks
+from move import DOUBLE_PUSH, EN_PASSANT, KING_CASTLE, PIECE_NAMES, QUEEN_CASTLE, Move, pack_move
+from movegen import (
+	BLACK_PAWN_ATTACKS, FILE_A, FILE_H, KING_ATTACKS, KNIGHT_ATTACKS, WHITE_PAWN_ATTACKS, generate_moves, iter_bits
+)
+
+# Pieces are stored as one 64-bit bitboard each. Square index = row * 8 + col, so a8 is bit 0 and h1 is bit 63.
+PIECES = PIECE_NAMES[1:]
+PIECE_CODES = {piece: code for code, piece in enumerate(PIECE_NAMES)}
+START_POSITION = (
+	"bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR",
+	"bP", "bP", "bP", "bP", "bP", "bP", "bP", "bP",
+	"", "", "", "", "", "", "", "",
+	"", "", "", "", "", "", "", "",
+	"", "", "", "", "", "", "", "",
+	"", "", "", "", "", "", "", "",
+	"wP", "wP", "wP", "wP", "wP", "wP", "wP", "wP",
+	"wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR",
+)
+
+
+def build_between_table():
+	"""Builds a bitboard of the squares strictly between every pair of squares on a shared line, 0 if they are not aligned"""
+	table = [[0] * 64 for _ in range(64)]
+	for a in range(64):
+		for b in range(64):
+			if rook_attacks(a, 0) & (1 << b):
+				table[a][b] = rook_attacks(a, 1 << b) & rook_attacks(b, 1 << a)
+			elif bishop_attacks(a, 0) & (1 << b):
+				table[a][b] = bishop_attacks(a, 1 << b) & bishop_attacks(b, 1 << a)
+	return table
+
+
+BETWEEN = build_between_table()
+
+# Castling rights as 4 bits: KQkq
+WHITE_KING_SIDE, WHITE_QUEEN_SIDE, BLACK_KING_SIDE, BLACK_QUEEN_SIDE = 0b0001, 0b0010, 0b0100, 0b1000
+# Rights kept when a piece moves from or to a square. Moving the king or a rook, or capturing a rook, loses the right.
+CASTLING_RIGHTS_MASK = [0b1111] * 64
+CASTLING_RIGHTS_MASK[60] = ~(WHITE_KING_SIDE | WHITE_QUEEN_SIDE)
+CASTLING_RIGHTS_MASK[63] = ~WHITE_KING_SIDE
+CASTLING_RIGHTS_MASK[56] = ~WHITE_QUEEN_SIDE
+CASTLING_RIGHTS_MASK[4] = ~(BLACK_KING_SIDE | BLACK_QUEEN_SIDE)
+CASTLING_RIGHTS_MASK[7] = ~BLACK_KING_SIDE
+CASTLING_RIGHTS_MASK[0] = ~BLACK_QUEEN_SIDE
+# Random keys for Zobrist hashing, seeded so hashes are the same between runs
+zobrist_rng = random.Random(2021)
+ZOBRIST_PIECES = {piece: [zobrist_rng.getrandbits(64) for _ in range(64)] for piece in PIECES}
+ZOBRIST_CASTLING = [zobrist_rng.getrandbits(64) for _ in range(16)]
+# Indexed by en passant square, the extra last entry is 0 so the "no square" value -1 doesn't change the hash
+ZOBRIST_EN_PASSANT = [zobrist_rng.getrandbits(64) for _ in range(64)] + [0]
+ZOBRIST_WHITE_MOVE = zobrist_rng.getrandbits(64)
+# Positions whose valid moves are kept in GameState.move_cache, the cache is emptied when it grows past this
+MOVE_CACHE_SIZE = 4096
+# Per colour: (right, squares that have to be empty, squares the king may not be attacked on, packed king move)
+CASTLES = {
+	True: (
+		(WHITE_KING_SIDE, 0x60 << 56, 0x60 << 56, pack_move(60, 62, KING_CASTLE)),
+		(WHITE_QUEEN_SIDE, 0x0E << 56, 0x0C << 56, pack_move(60, 58, QUEEN_CASTLE)),
+	),
+	False: (
+		(BLACK_KING_SIDE, 0x60, 0x60, pack_move(4, 6, KING_CASTLE)),
+		(BLACK_QUEEN_SIDE, 0x0E, 0x0C, pack_move(4, 2, QUEEN_CASTLE)),
+	),
+}
+
 
 class GameState():
 	"""Class representing the state of a Chess game."""
 	def __init__(self):
-		self.board = np.array([
-			["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
-			["bP" for _ in range(8)],
-			["" for _ in range(8)],
-			["" for _ in range(8)],
-			["" for _ in range(8)],
-			["" for _ in range(8)],
-			["wP" for _ in range(8)],
-			["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]
-		])
+		self.bb = {piece: 0 for piece in PIECES}
+		self.occ_w = 0
+		self.occ_b = 0
+		self.occ_all = 0
+		# Zobrist hash of the position, updated incrementally with every change to the board
+		self.zobrist = 0
+		# Mailbox kept alongside the bitboards for O(1) piece lookups: board[row * 8 + col] is a code into PIECE_NAMES
+		self.board = bytearray(64)
+		for sq, piece in enumerate(START_POSITION):
+			if piece:
+				self.put_piece(piece, sq)
 		self.white_move = True
 		self.movelog = []
+		self.castling = WHITE_KING_SIDE | WHITE_QUEEN_SIDE | BLACK_KING_SIDE | BLACK_QUEEN_SIDE
+		# Castling rights before each logged move, restored by undo_move
+		self.castling_log = []
 		self.checkmate = False
 		self.stalemate = False
-		self.white_king_loc = (7, 4)
-		self.black_king_loc = (0, 4)
+		# Attack bitboards per colour for the current position, cleared whenever the position changes
+		self.attack_cache = {}
+		# Valid moves per Zobrist hash, so revisited positions don't need new move generation
+		self.move_cache = {}
+		self.zobrist = self.compute_zobrist()
 
-	def make_move(self, move: Move, log=True):
-		"""Takes a move-object and executes the move"""
-		self.board[move.startRow][move.startCol] = ""		
-		self.board[move.piece_captured_row][move.piece_captured_col] = ""
-		self.board[move.endRow][move.endCol] = move.piece_moved
-		if log:
-			self.movelog.append(move)
-		if move.piece_moved == "wK":
-			self.white_king_loc = (move.endRow, move.endCol)
-		if move.piece_moved == "bK":
-			self.black_king_loc = (move.endRow, move.endCol)
-		if hasattr(move, "secondary_move") and isinstance(move.secondary_move, Move):
-			self.make_move(move.secondary_move, log=False)
+	"""
+	Methods for manipulating the bitboards
+	"""
+
+	def piece_at(self, sq):
+		"""Returns the piece on a square, or an empty string"""
+		return PIECE_NAMES[self.board[sq]]
+
+	def put_piece(self, piece, sq):
+		"""Places a piece on an empty square"""
+		bit = 1 << sq
+		self.bb[piece] |= bit
+		if piece[0] == "w":
+			self.occ_w |= bit
 		else:
-			self.white_move = not self.white_move
+			self.occ_b |= bit
+		self.occ_all |= bit
+		self.board[sq] = PIECE_CODES[piece]
+		self.zobrist ^= ZOBRIST_PIECES[piece][sq]
+
+	def remove_piece(self, piece, sq):
+		"""Removes a piece from a square"""
+		bit = 1 << sq
+		self.bb[piece] &= ~bit
+		if piece[0] == "w":
+			self.occ_w &= ~bit
+		else:
+			self.occ_b &= ~bit
+		self.occ_all &= ~bit
+		self.board[sq] = 0
+		self.zobrist ^= ZOBRIST_PIECES[piece][sq]
+
+	def shift_piece(self, piece, start, end):
+		"""Moves a piece between two squares, the end square has to be empty"""
+		move_bits = (1 << start) | (1 << end)
+		self.bb[piece] ^= move_bits
+		if piece[0] == "w":
+			self.occ_w ^= move_bits
+		else:
+			self.occ_b ^= move_bits
+		self.occ_all ^= move_bits
+		self.board[end] = self.board[start]
+		self.board[start] = 0
+		self.zobrist ^= ZOBRIST_PIECES[piece][start] ^ ZOBRIST_PIECES[piece][end]
+
+	def compute_zobrist(self):
+		"""Computes the Zobrist hash of the position from scratch"""
+		key = ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_EN_PASSANT[self.en_passant_square()]
+		if self.white_move:
+			key ^= ZOBRIST_WHITE_MOVE
+		for piece in PIECES:
+			for sq in iter_bits(self.bb[piece]):
+				key ^= ZOBRIST_PIECES[piece][sq]
+		return key
+
+	def make_move(self, move: Move):
+		"""Takes a move-object and executes the move"""
+		self.attack_cache.clear()
+		# Castling rights and en passant square of the old position leave the hash, the new ones are added at the end
+		self.zobrist ^= ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_EN_PASSANT[self.en_passant_square()]
+		start, end = move.startRow * 8 + move.startCol, move.endRow * 8 + move.endCol
+		if move.piece_captured:
+			self.remove_piece(move.piece_captured, move.piece_captured_row * 8 + move.piece_captured_col)
+		self.shift_piece(move.piece_moved, start, end)
+		# Executes a secondary move associated with the move, i.e. castling.
+		if move.secondary_move:
+			rook_move = move.secondary_move
+			self.shift_piece(rook_move.piece_moved, rook_move.startRow * 8 + rook_move.startCol, rook_move.endRow * 8 + rook_move.endCol)
+		self.castling_log.append(self.castling)
+		self.castling &= CASTLING_RIGHTS_MASK[start] & CASTLING_RIGHTS_MASK[end]
+		self.movelog.append(move)
+		self.white_move = not self.white_move
+		self.zobrist ^= ZOBRIST_WHITE_MOVE ^ ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_EN_PASSANT[self.en_passant_square()]
 
 	def undo_move(self):
 		"""Reverses last made move"""
 		if self.movelog:
+			self.attack_cache.clear()
+			self.zobrist ^= ZOBRIST_WHITE_MOVE ^ ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_EN_PASSANT[self.en_passant_square()]
 			move = self.movelog.pop()
-			self.board[move.startRow][move.startCol] = move.piece_moved
-			self.board[move.endRow][move.endCol] = ""
-			self.board[move.piece_captured_row][move.piece_captured_col] = move.piece_captured if move.piece_captured else ""
-			# Executes a secondary move associated with the move, i.e. castling.
-			if hasattr(move, "secondary_move") and isinstance(move.secondary_move, Move):
-				move = move.secondary_move
-				self.board[move.startRow][move.startCol] = move.piece_moved
-				self.board[move.endRow][move.endCol] = ""
-				self.board[move.piece_captured_row][move.piece_captured_col] = move.piece_captured if move.piece_captured else ""
+			self.castling = self.castling_log.pop()
+			self.shift_piece(move.piece_moved, move.endRow * 8 + move.endCol, move.startRow * 8 + move.startCol)
+			if move.piece_captured:
+				self.put_piece(move.piece_captured, move.piece_captured_row * 8 + move.piece_captured_col)
+			# Reverses a secondary move associated with the move, i.e. castling.
+			if move.secondary_move:
+				rook_move = move.secondary_move
+				self.shift_piece(rook_move.piece_moved, rook_move.endRow * 8 + rook_move.endCol, rook_move.startRow * 8 + rook_move.startCol)
 			self.white_move = not self.white_move
+			self.zobrist ^= ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_EN_PASSANT[self.en_passant_square()]
+
+	def compute_attack_bb(self, by_white):
+		"""
+		Returns a bitboard of all squares attacked by the given colour, cached until the position changes.
+		Sliders see through the defending king, so the squares behind it count as attacked and the king can't step back along the ray.
+		"""
+		if by_white in self.attack_cache:
+			return self.attack_cache[by_white]
+		colour = "w" if by_white else "b"
+		bb = self.bb
+		occ = self.occ_all & ~bb["bK" if by_white else "wK"]
+		pawns = bb[colour + "P"]
+		# Captures to the left can't wrap onto the h-file, captures to the right can't wrap onto the a-file
+		if by_white:
+			attacks = ((pawns >> 9) & ~FILE_H) | ((pawns >> 7) & ~FILE_A)
+		else:
+			attacks = ((pawns << 7) & ~FILE_H & MASK_64) | ((pawns << 9) & ~FILE_A & MASK_64)
+		for piece, table in (("N", KNIGHT_ATTACKS), ("K", KING_ATTACKS)):
+			pieces = bb[colour + piece]
+			while pieces:
+				lsb = pieces & -pieces
+				attacks |= table[lsb.bit_length() - 1]
+				pieces ^= lsb
+		for sliders, lookup in ((bb[colour + "R"] | bb[colour + "Q"], rook_attacks), (bb[colour + "B"] | bb[colour + "Q"], bishop_attacks)):
+			while sliders:
+				lsb = sliders & -sliders
+				attacks |= lookup(lsb.bit_length() - 1, occ)
+				sliders ^= lsb
+		self.attack_cache[by_white] = attacks
+		return attacks
 
 	def square_attacked(self, row, col):
-		"""Check whether a square is attacked or not. Does this by checking all possible opponent-moves in a gamestate."""
-		self.white_move = not self.white_move
-		possible_moves = self.get_possible_moves()
-		self.white_move = not self.white_move
-		return any(move.endRow == row and move.endCol == col for move in possible_moves)
+		"""Check whether a square is attacked by the opponent or not"""
+		return bool((self.compute_attack_bb(not self.white_move) >> (row * 8 + col)) & 1)
 
 	def in_check(self):
 		"""Checks whether current player is in check"""
-		if self.white_move:
-			return self.square_attacked(*self.white_king_loc)
-		else:
-			return self.square_attacked(*self.black_king_loc)
+		king = self.bb["wK"] if self.white_move else self.bb["bK"]
+		return bool(self.compute_attack_bb(not self.white_move) & king)
 
 	def check_game_state(self, moves):
 		"""Checks the gamestate for stalemate or checkmate"""
-		if not moves:
-			if self.in_check:
-				self.checkmate = True
-			else:
-				self.stalemate = True
+		in_check = self.in_check()
+		self.checkmate = not moves and in_check
+		self.stalemate = not moves and not in_check
 
 	def get_valid_moves(self):
 		"""
 		Generates all valid moves. Takes checks on current player into account.
-		This is a fairly rudimentary solution, which might be to slow for implementing ML, we'll find out :)
+		Results are cached per position, so the returned list must not be modified.
 		"""
-		possible_moves = self.get_possible_moves()
-		moves = self.remove_selfchecks(possible_moves)
+		moves = self.move_cache.get(self.zobrist)
+		if moves is None:
+			# Legality is decided on packed moves, Move-objects are only created for the moves that are left
+			legal_moves = self.remove_selfchecks_raw(self.get_possible_moves_raw())
+			moves = [Move.from_raw(raw, self.board) for raw in legal_moves]
+			if len(self.move_cache) >= MOVE_CACHE_SIZE:
+				self.move_cache.clear()
+			self.move_cache[self.zobrist] = moves
 		self.check_game_state(moves)
 		return moves
 
-	def remove_selfchecks(self, moves):
-		"""Removes moves that put yourself in check"""
-		for move in moves.copy():
-			self.make_move(move)
-			# Swap to opponent to check if in check
-			self.white_move = not self.white_move
-			if self.in_check():
-				moves.remove(move)
-			self.white_move = not self.white_move
-			self.undo_move()
-		return moves
-
-	def get_possible_moves(self):
-		"""Generates all possible moves"""
-		moves = []
-		turn = "w" if self.white_move else "b"
-		for row_no, row in enumerate(self.board):
-			for col_no, player_piece in enumerate(row):
-				if player_piece.startswith(turn):
-					piece = player_piece[1]
-					if piece == "P":
-						self.get_pawn_moves(moves, row_no, col_no)
-						self.get_en_passant(moves, row_no, col_no)
-					elif piece == "K":
-						self.get_king_moves(moves, row_no, col_no)
-						self.get_castles(moves)
-					elif piece == "Q":
-						self.get_queen_moves(moves, row_no, col_no)
-					elif piece == "R":
-						self.get_rook_moves(moves, row_no, col_no)
-					elif piece == "N":
-						self.get_knight_moves(moves, row_no, col_no)
-					elif piece == "B":
-						self.get_bishop_moves(moves, row_no, col_no)
-		return moves
+	def attackers_to(self, sq, occ, by_white):
+		"""Returns a bitboard of all pieces of the given colour attacking sq, with sliders blocked by occ"""
+		colour = "w" if by_white else "b"
+		bb = self.bb
+		# A white pawn attacks sq from the squares a black pawn on sq would attack, and vice versa
+		pawn_attacks = BLACK_PAWN_ATTACKS if by_white else WHITE_PAWN_ATTACKS
+		return (
+			(pawn_attacks[sq] & bb[colour + "P"])
+			| (KNIGHT_ATTACKS[sq] & bb[colour + "N"])
+			| (KING_ATTACKS[sq] & bb[colour + "K"])
+			| (rook_attacks(sq, occ) & (bb[colour + "R"] | bb[colour + "Q"]))
+			| (bishop_attacks(sq, occ) & (bb[colour + "B"] | bb[colour + "Q"]))
+		)
 
-	"""
-	Methods for moving pieces
-	"""
+	def compute_pins_and_checkers(self, king_sq):
+		"""
+		Finds the pieces giving check to the current player, and the current player's pieces pinned to their king.
+		Returns (checkers, pins), where pins maps the square of a pinned piece to the bitboard of squares it may still move to.
+		"""
+		enemy = "b" if self.white_move else "w"
+		checkers = self.attackers_to(king_sq, self.occ_all, not self.white_move)
+		pins = {}
+		# Enemy sliders that would attack the king if none of our pieces were in the way
+		enemy_occ = self.enemy_occ()
+		snipers = (
+			(rook_attacks(king_sq, enemy_occ) & (self.bb[enemy + "R"] | self.bb[enemy + "Q"]))
+			| (bishop_attacks(king_sq, enemy_occ) & (self.bb[enemy + "B"] | self.bb[enemy + "Q"]))
+		)
+		for sniper_sq in iter_bits(snipers):
+			blockers = BETWEEN[king_sq][sniper_sq] & self.occ_all
+			# Exactly one blocker, and it is ours
+			if blockers.bit_count() == 1 and blockers & self.ally_occ():
+				pins[blockers.bit_length() - 1] = BETWEEN[king_sq][sniper_sq] | (1 << sniper_sq)
+		return checkers, pins
 
-	def get_pawn_moves(self, moves, row_no, col_no):
-		"""Appends all possible pawn moves to move-list"""
-		if self.white_move:
-			# One square forward
-			# Check that square ahead is empty
-			if 0 <= row_no - 1 < 8 and not self.board[row_no - 1][col_no]:
-				moves.append(Move(self.board, (row_no, col_no), (row_no - 1, col_no)))
-				# Two squares on first move
-				if row_no == 6 and not self.board[row_no - 2][col_no]:
-					moves.append(Move(self.board, (row_no, col_no), (row_no - 2, col_no)))
-			# Take one move diagonally forward
-			if 0 <= row_no - 1 < 8 and 0 <= col_no - 1 < 8 and self.board[row_no - 1][col_no - 1]:
-				moves.append(Move(self.board, (row_no, col_no), (row_no - 1, col_no - 1)))
-			if 0 <= row_no - 1 < 8 and col_no + 1 < 8 and self.board[row_no - 1][col_no + 1]:
-				moves.append(Move(self.board, (row_no, col_no), (row_no - 1, col_no + 1)))
+	def remove_selfchecks_raw(self, moves):
+		"""
+		Removes packed moves that put yourself in check.
+		Filters on pins and checkers instead of making every move, so only the bitboards are read.
+		"""
+		king = self.bb["wK"] if self.white_move else self.bb["bK"]
+		king_sq = king.bit_length() - 1
+		checkers, pins = self.compute_pins_and_checkers(king_sq)
+		# Squares a piece other than the king has to move to, to resolve a check
+		if checkers.bit_count() > 1:
+			# Double check, only the king can move
+			evasions = 0
+		elif checkers:
+			evasions = BETWEEN[king_sq][checkers.bit_length() - 1] | checkers
 		else:
-			# One square forward
-			# Check that square ahead is empty
-			if 0 <= row_no + 1 < 8 and not self.board[row_no + 1][col_no]:
-				moves.append(Move(self.board, (row_no, col_no), (row_no + 1, col_no)))
-				# Two squares on first move
-				if row_no == 1 and not self.board[row_no + 2][col_no]:
-					moves.append(Move(self.board, (row_no, col_no), (row_no + 2, col_no)))
-			# Take one move diagonally forward
-			if 0 <= row_no + 1 < 8 and 0 <= col_no - 1 < 8 and self.board[row_no + 1][col_no - 1]:
-				moves.append(Move(self.board, (row_no, col_no), (row_no + 1, col_no - 1)))
-			if 0 <= row_no + 1 < 8 and col_no + 1 < 8 and self.board[row_no + 1][col_no + 1]:
-				moves.append(Move(self.board, (row_no, col_no), (row_no + 1, col_no + 1)))
-		return moves
+			evasions = ~0
+		enemy_attacks = self.compute_attack_bb(not self.white_move)
+		legal_moves = []
+		for raw in moves:
+			start = raw >> 10
+			end_bit = 1 << ((raw >> 4) & 63)
+			if start == king_sq:
+				if not enemy_attacks & end_bit:
+					legal_moves.append(raw)
+			elif raw & 15 == EN_PASSANT:
+				# The captured pawn stands on the start row, in the end column
+				captured_bit = 1 << ((start & ~7) | ((raw >> 4) & 7))
+				# En passant removes two pieces from a line at once, check the resulting occupancy directly
+				occ = self.occ_all ^ (1 << start) ^ end_bit ^ captured_bit
+				if not self.attackers_to(king_sq, occ, not self.white_move) & ~captured_bit:
+					legal_moves.append(raw)
+			elif evasions & end_bit and (start not in pins or pins[start] & end_bit):
+				legal_moves.append(raw)
+		return legal_moves
 
-	def get_en_passant(self, moves, row_no, col_no):
-		col_right = col_no + 1
-		col_left = col_no - 1
-		if self.movelog:
-			last_move = self.movelog[-1]
-			if last_move.piece_moved[1] == "P": # index 1 for piecetype, not colour
-				if self.white_move:
-					if row_no == 3: # Check location of pawn to be moved
-						if last_move.startRow == 1 and last_move.endRow == 3: # Check start en end of last move
-							if last_move.endCol == col_right:
-								moves.append(
-									Move(self.board, (row_no, col_no), (row_no - 1, col_right), captured_row=last_move.endRow, captured_col=last_move.endCol)
-								)
-							elif last_move.endCol == col_left:
-								moves.append(
-									Move(self.board, (row_no, col_no), (row_no - 1, col_left), captured_row=last_move.endRow, captured_col=last_move.endCol)
-								)
-				else: # Black move
-					if row_no == 5: 
-						if last_move.startRow == 1 and last_move.endRow == 5:
-							if last_move.endCol == col_right:
-								moves.append(
-									Move(self.board, (row_no, col_no), (row_no + 1, col_right), captured_row=last_move.endRow, captured_col=last_move.endCol)
-								)
-							elif last_move.endCol == col_left:
-								moves.append(
-									Move(self.board, (row_no, col_no), (row_no + 1, col_left), captured_row=last_move.endRow, captured_col=last_move.endCol)
-								)
+	def get_possible_moves_raw(self):
+		"""Generates all possible moves, packed as integers"""
+		moves = generate_moves(self.bb, self.occ_w, self.occ_b, self.white_move, self.en_passant_square(), [])
+		self.get_castles(moves)
 		return moves
 
-	def get_king_moves(self, moves, row_no, col_no):
-		"""Appends all possible king moves to move-list"""
-		ally_colour = "w" if self.white_move else "b"
-		for i in range(-1, 2):
-			for j in range(-1, 2):
-				if 0 <= row_no + i < 8 and 0 <= col_no + j < 8:
-					endpiece = self.board[row_no + i][col_no + j]
-					if not endpiece.startswith(ally_colour):
-						moves.append(Move(self.board, (row_no, col_no), (row_no + i, col_no + j)))
-		return moves
+	def get_possible_moves(self):
+		"""Generates all possible moves as Move-objects"""
+		return [Move.from_raw(raw, self.board) for raw in self.get_possible_moves_raw()]
 
-	def get_queen_moves(self, moves, row_no, col_no):
-		"""Appends all possible queen moves to move-list"""
-		moves.extend(self.get_rook_moves(moves, row_no, col_no))
-		moves.extend(self.get_bishop_moves(moves, row_no, col_no))
-		return moves
+	def enemy_occ(self):
+		"""Bitboard of all squares occupied by the opponent of the current player"""
+		return self.occ_b if self.white_move else self.occ_w
 
-	def get_rook_moves(self, moves, row_no, col_no):
-		"""Appends all possible rook moves to move-list"""
-		ally_colour = "w" if self.white_move else "b"
-		# The dimensions of all possible rook moves
-		directs = ((-1, 0), (0, -1), (1, 0), (0, 1))
-		# Forwards and backwards
-		for d in directs:
-			for i in range(1, 8):
-				end_row = row_no + d[0] * i 
-				end_col = col_no + d[1] * i
-				if 0 <= end_row < 8 and 0 <= end_col < 8:
-					endpiece = self.board[end_row][end_col]
-					if not endpiece.startswith(ally_colour):
-						moves.append(Move(self.board, (row_no, col_no), (end_row, end_col)))
-					if endpiece:
-						break
-		return moves
+	def ally_occ(self):
+		"""Bitboard of all squares occupied by the current player"""
+		return self.occ_w if self.white_move else self.occ_b
 
-	def get_bishop_moves(self, moves, row_no, col_no):
-		"""Appends all possible bishop moves to move-list"""
-		ally_colour = "w" if self.white_move else "b"
-		# The dimensions of all possible bishop moves
-		directs = ((-1, -1), (1, 1), (-1, 1), (1, -1))
-		for d in directs:
-			for i in range(1, 8):
-				end_row = row_no + d[0] * i 
-				end_col = col_no + d[1] * i
-				if 0 <= end_row < 8 and 0 <= end_col < 8:
-					endpiece = self.board[end_row][end_col]
-					if not endpiece.startswith(ally_colour):
-						moves.append(Move(self.board, (row_no, col_no), (end_row, end_col)))
-					if endpiece:
-						break
-		return moves
+	def en_passant_square(self):
+		"""Returns the square a pawn can capture en passant on, or -1 if the last move wasn't a double pawn step"""
+		if self.movelog:
+			last_move = self.movelog[-1]
+			if last_move.flags == DOUBLE_PUSH:
+				# The capture square is the one the double step passed over
+				return (last_move.startRow + last_move.endRow) // 2 * 8 + last_move.endCol
+		return -1
 
-	def get_knight_moves(self, moves, row_no, col_no):
-		"""Appends all possible knight moves to move-list"""
-		ally_colour = "w" if self.white_move else "b"
-		# All distances from current square to possible squares
-		possible_moves = [(2, 1), (2, -1), (1, 2), (1, -2), (-2, 1), (-2, -1), (-1, 2), (-1, -2)]
-		for move in possible_moves:
-			end_row = row_no + move[0] 
-			end_col = col_no + move[1]
-			if 0 <= end_row < 8 and 0 <= end_col < 8:
-				endpiece = self.board[end_row][end_col]
-				if not endpiece.startswith(ally_colour):
-					moves.append(Move(self.board, (row_no, col_no), (end_row, end_col)))
-		return moves
+	"""
+	Methods for special moves
+	"""
 
 	def get_castles(self, moves):
-		if self.white_move:
-			# check king has not moved
-			if not any((move.startRow, move.startCol) == (7, 4) for move in self.movelog):
-				# Checking that Rh1 has not moved
-				if not any((move.startRow, move.startCol) == (7, 7) for move in self.movelog) and not any([self.board[7][5] != "", self.board[7][6] != ""]):
-					rook_move = Move(self.board, (7, 7), (7, 5))
-					king_move = Move(self.board, (7, 4), (7, 6), secondary_move=rook_move)
-					king_move.PGN = "O-O"
-					moves.append(king_move)
-				# Checking that Ra1 has not moved
-				if not any((move.startRow, move.startCol) == (7, 0) for move in self.movelog) and not any([self.board[7][1] != "", self.board[7][2] != "", self.board[7][3] != ""]):
-					print(21980371)
-					rook_move = Move(self.board, (7, 0), (7, 3))
-					king_move = Move(self.board, (7, 4), (7, 2), secondary_move=rook_move)
-					king_move.PGN = "O-O-O"
-					moves.append(king_move)
-		else:
-			if not any((move.startRow, move.startCol) == (0, 4) for move in self.movelog):
-				if not any((move.startRow, move.startCol) == (0, 7) for move in self.movelog) and not any([self.board[0][5] != "", self.board[0][6] != ""]):
-					rook_move = Move(self.board, (0, 7), (0, 5))
-					king_move = Move(self.board, (0, 4), (0, 6), secondary_move=rook_move)
-					king_move.PGN = "O-O"
-					moves.append(king_move)
-				if not any((move.startRow, move.startCol) == (0, 0) for move in self.movelog) and not any([self.board[0][1] != "", self.board[0][2] != "", self.board[0][3] != ""]):
-					rook_move = Move(self.board, (0, 0), (0, 3))
-					king_move = Move(self.board, (0, 4), (0, 2), secondary_move=rook_move)
-					king_move.PGN = "O-O-O"
-					moves.append(king_move)
-		return moves
\ No newline at end of file
+		"""Appends all possible castling moves, packed as integers. The king may not castle out of, through or into check."""
+		castles = CASTLES[self.white_move]
+		if not self.castling & (castles[0][0] | castles[1][0]) or self.in_check():
+			return moves
+		enemy_attacks = self.compute_attack_bb(not self.white_move)
+		for right, empty, safe, king_move in castles:
+			if self.castling & right and not self.occ_all & empty and not enemy_attacks & safe:
+				moves.append(king_move)
+		return moves
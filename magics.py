@@ -0,0 +1,115 @@
+"""
+Magic bitboard lookups for sliding pieces.
+The attack set of a rook or bishop on a square, given the current occupancy, is read from a precomputed table.
+The table index is found by multiplying the relevant blockers with a magic number and keeping the top bits.
+"""
+
+MASK_64 = (1 << 64) - 1
+
+ROOK_DIRECTS = ((-1, 0), (0, -1), (1, 0), (0, 1))
+BISHOP_DIRECTS = ((-1, -1), (1, 1), (-1, 1), (1, -1))
+
+# Magic numbers for square index row * 8 + col, found by a random search for collision-free multipliers
+ROOK_MAGICS = (
+	0x128012c0008000e0, 0x0240002000401001, 0x4100200041001008, 0x8280100008018004,
+	0x2080080002040080, 0x1300010004008208, 0x04000208a9101408, 0x020000204a018f04,
+	0x1080800040008020, 0x0000c01000402001, 0x0080808010002000, 0x0408800800801000,
+	0x0010800801040080, 0x4804800400804200, 0x0304800d00800200, 0x010200040081006a,
+	0x8280044020084000, 0x042000c010004021, 0x2010002004080020, 0x0040210010000900,
+	0x0008004004020041, 0x0004008080040200, 0x1c20040070610208, 0x1020a20000508104,
+	0x0100c00380008120, 0x4001200280400080, 0x0200100080200080, 0x0000401200082200,
+	0xc02c080080040080, 0x0840040080020080, 0x2102004040800100, 0x0042079a00004104,
+	0x0000400424800280, 0x4820100020400040, 0x5010002000801880, 0x9061080081801002,
+	0x208a050011000800, 0x000200080e003094, 0xa010018204003008, 0x2000288042001401,
+	0x400181c000228000, 0x0200402010004000, 0x8388928600420021, 0x400021001001000a,
+	0x2100080011010004, 0x1002020004008080, 0x0802000804020001, 0x88004410408a0001,
+	0x010508c030800100, 0x4000400080310100, 0x0030200010048080, 0x2000800800100080,
+	0x0100040008008080, 0x0022000204008080, 0x0108020170284400, 0x1001010084004200,
+	0x0004890141902202, 0x0100881100220042, 0x0100102001000841, 0x4408050020081001,
+	0x0002008884201002, 0x2002000490410802, 0x0020014800900204, 0x0100082081044402,
+)
+BISHOP_MAGICS = (
+	0x0010104088840042, 0x0110104081004062, 0x0091142082000100, 0x0108208821008100,
+	0x0101104000080000, 0x010104200404001c, 0x0c01040202c00010, 0x0001004800841080,
+	0xca8b46100e280102, 0x001010d00085024c, 0x4180089881020120, 0x8010082050411000,
+	0x0800020210100000, 0x0002120905201200, 0xc000040404040510, 0x0110410101100200,
+	0x0042201408020c27, 0xa882000404440c20, 0x0002000102040100, 0x800200202202c200,
+	0x4002005012101401, 0x2441014880600200, 0x0214020104018400, 0x000180004414410a,
+	0x0105410c10020800, 0x0004200084013400, 0x200582045004001b, 0x1000404004010200,
+	0x0001001081004021, 0x2400430202008628, 0x000604c144230800, 0x04004840008a1804,
+	0x4010045000220210, 0x2012100400500120, 0x10001c0205900081, 0x0020880800360a00,
+	0x8500460020060080, 0x0420008209010110, 0x0010020250008c00, 0x8010a40100004104,
+	0x00008208400022c8, 0x0008410450402100, 0x0008920110004104, 0x43a8011044002024,
+	0x0029102021900602, 0x2270101000212040, 0x0020c41112004040, 0x3004840550c42200,
+	0x5002022202404480, 0x0402822309200840, 0x0032010423240048, 0x2000ca0384110008,
+	0x4001140410440000, 0x2092e50810011010, 0x0140040852005041, 0x00200200c1010104,
+	0x40120202020104e0, 0xa000010042300500, 0x400048004a009001, 0x4200800400411081,
+	0x0010040604105400, 0x0107004210024080, 0x0004423004210040, 0xc220023088010040,
+)
+
+
+def ray_attacks(sq, occ, directs):
+	"""Slow reference generator: walks every direction from sq until the edge or the first blocker"""
+	row_no, col_no = divmod(sq, 8)
+	targets = 0
+	for d in directs:
+		end_row, end_col = row_no + d[0], col_no + d[1]
+		while 0 <= end_row < 8 and 0 <= end_col < 8:
+			bit = 1 << (end_row * 8 + end_col)
+			targets |= bit
+			if occ & bit:
+				break
+			end_row += d[0]
+			end_col += d[1]
+	return targets
+
+
+def relevant_mask(sq, directs):
+	"""Squares that can block a slider on sq. The last square of every ray never blocks anything behind it, so it is left out."""
+	row_no, col_no = divmod(sq, 8)
+	mask = 0
+	for d in directs:
+		end_row, end_col = row_no + d[0], col_no + d[1]
+		while 0 <= end_row + d[0] < 8 and 0 <= end_col + d[1] < 8:
+			mask |= 1 << (end_row * 8 + end_col)
+			end_row += d[0]
+			end_col += d[1]
+	return mask
+
+
+def build_tables(directs, magics):
+	"""Builds masks, shifts and attack tables for every square"""
+	masks, shifts, tables = [], [], []
+	for sq in range(64):
+		mask = relevant_mask(sq, directs)
+		shift = 64 - mask.bit_count()
+		table = [0] * (1 << mask.bit_count())
+		# Enumerate every subset of the mask (carry-rippler)
+		occ = 0
+		while True:
+			idx = ((occ * magics[sq]) & MASK_64) >> shift
+			attacks = ray_attacks(sq, occ, directs)
+			# Occupancies may only share a slot if they give the same attacks, otherwise the magic is wrong
+			assert table[idx] in (0, attacks), f"bad magic for square {sq}"
+			table[idx] = attacks
+			occ = (occ - mask) & mask
+			if not occ:
+				break
+		masks.append(mask)
+		shifts.append(shift)
+		tables.append(table)
+	return masks, shifts, tables
+
+
+ROOK_MASKS, ROOK_SHIFTS, ROOK_ATTACKS = build_tables(ROOK_DIRECTS, ROOK_MAGICS)
+BISHOP_MASKS, BISHOP_SHIFTS, BISHOP_ATTACKS = build_tables(BISHOP_DIRECTS, BISHOP_MAGICS)
+
+
+def rook_attacks(sq, occ):
+	"""Bitboard of all squares a rook on sq attacks, given the occupancy"""
+	return ROOK_ATTACKS[sq][(((occ & ROOK_MASKS[sq]) * ROOK_MAGICS[sq]) & MASK_64) >> ROOK_SHIFTS[sq]]
+
+
+def bishop_attacks(sq, occ):
+	"""Bitboard of all squares a bishop on sq attacks, given the occupancy"""
+	return BISHOP_ATTACKS[sq][(((occ & BISHOP_MASKS[sq]) * BISHOP_MAGICS[sq]) & MASK_64) >> BISHOP_SHIFTS[sq]]
@@ -1,17 +1,56 @@
+from functools import cached_property
+
+# Piece names by the code stored in the mailbox, code 0 is an empty square
+PIECE_NAMES = ("", "wP", "wN", "wB", "wR", "wQ", "wK", "bP", "bN", "bB", "bR", "bQ", "bK")
+
+# Move flags, stored in the lowest 4 bits of a packed move
+QUIET = 0
+DOUBLE_PUSH = 1
+EN_PASSANT = 2
+KING_CASTLE = 3
+QUEEN_CASTLE = 4
+
+
+def pack_move(start_sq, end_sq, flags=QUIET):
+	"""Packs a move into a single integer: (from << 10) | (to << 4) | flags"""
+	return (start_sq << 10) | (end_sq << 4) | flags
+
+
+def move_from(raw):
+	return raw >> 10
+
+
+def move_to(raw):
+	return (raw >> 4) & 63
+
+
+def move_flags(raw):
+	return raw & 15
+
+
 class Move:
 	"""Class representation of a chess move"""
-	def __init__(self, board, start, end, captured_row=None, captured_col=None, primary_move=None, secondary_move=None):
+	def __init__(self, board, start, end, flags=None):
 		self.startRow, self.startCol = start
 		self.endRow, self.endCol = end
 		self.piece_moved = self.get_piece(board, self.startRow, self.startCol)
-		self.piece_captured_row = captured_row if captured_row else self.endRow
-		self.piece_captured_col = captured_col if captured_col else self.endCol
+		self.flags = self.classify(board) if flags is None else flags
+		# En passant captures the pawn next to the moving pawn, not on the end square
+		self.piece_captured_row = self.startRow if self.flags == EN_PASSANT else self.endRow
+		self.piece_captured_col = self.endCol
 		self.piece_captured = self.get_piece(board, self.piece_captured_row, self.piece_captured_col)
-		self.primary_move = primary_move
-		self.secondary_move = secondary_move
-		self.move_id = int(f"{self.startRow}{self.startCol}{self.endRow}{self.endCol}")
-		# Not true PGN notation, but similar
-		self.PGN = self.move_notation()
+		# Castling also moves the rook
+		self.secondary_move = None
+		if self.flags == KING_CASTLE:
+			self.secondary_move = Move(board, (self.startRow, 7), (self.startRow, 5), flags=QUIET)
+		elif self.flags == QUEEN_CASTLE:
+			self.secondary_move = Move(board, (self.startRow, 0), (self.startRow, 3), flags=QUIET)
+		self.move_id = pack_move(self.startRow * 8 + self.startCol, self.endRow * 8 + self.endCol, self.flags)
+
+	@classmethod
+	def from_raw(cls, raw, board):
+		"""Creates a Move-object from a packed move, on the board it is played on"""
+		return cls(board, divmod(move_from(raw), 8), divmod(move_to(raw), 8), flags=move_flags(raw))
 
 	def __str__(self):
 		return self.PGN
@@ -23,30 +62,56 @@ class Move:
 		if isinstance(other, Move):
 			return self.move_id == other.move_id
 
+	def __hash__(self):
+		return self.move_id
+
+	def classify(self, board):
+		"""Works out the flags of a move from the board it is played on"""
+		piece = self.piece_moved[1:]
+		if piece == "P":
+			if abs(self.endRow - self.startRow) == 2:
+				return DOUBLE_PUSH
+			# A pawn moving diagonally to an empty square captures en passant
+			if self.startCol != self.endCol and not self.get_piece(board, self.endRow, self.endCol):
+				return EN_PASSANT
+		elif piece == "K" and abs(self.endCol - self.startCol) == 2:
+			return KING_CASTLE if self.endCol == 6 else QUEEN_CASTLE
+		return QUIET
+
+	# Row 0 is rank 8 and column 0 is file a, so both convert with character arithmetic
 	@staticmethod
 	def ranks_to_rows(rank):
-		return {"1":7, "2":6, "3":5, "4":4, "5":3, "6":2, "7":1, "8":0}[rank]
+		return ord("8") - ord(rank)
 
 	@staticmethod
 	def rows_to_ranks(row):
-		return {7: "1", 6: "2", 5: "3", 4: "4", 3: "5", 2: "6", 1: "7", 0: "8"}[row]
+		return chr(ord("8") - row)
 
 	@staticmethod
 	def files_to_cols(file):
-		return {"a":0, "b":1, "c":2, "d":3, "e":4, "f":5, "g":6, "h":7}[file]
+		return ord(file) - ord("a")
 
 	@staticmethod
 	def cols_to_files(col):
-		return {0: "a", 1: "b", 2: "c", 3: "d", 4: "e", 5: "f", 6: "g", 7: "h"}[col]
+		return chr(ord("a") + col)
 
 	@staticmethod
 	def get_piece(board, row, col):
-		return board[row][col]
+		return PIECE_NAMES[board[row * 8 + col]]
 
 	def get_rank_file(self, row, col):
-		return self.cols_to_files(col) + self.rows_to_ranks(row)
+		return chr(ord("a") + col) + chr(ord("8") - row)
+
+	@cached_property
+	def PGN(self):
+		"""Not true PGN notation, but similar. Only worked out when a move is shown or logged."""
+		return self.move_notation()
 
 	def move_notation(self):
 		"""Converts the internal representation of a move to notation similar to PGN"""
+		if self.flags == KING_CASTLE:
+			return "O-O"
+		if self.flags == QUEEN_CASTLE:
+			return "O-O-O"
 		piece = self.piece_moved[1] if self.piece_moved else ""
 		return piece + self.get_rank_file(self.endRow, self.endCol)
\ No newline at end of file
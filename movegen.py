@@ -0,0 +1,116 @@
+"""
+Pseudo-legal move generation on bitboards.
+Works on plain integers only, moves are packed as (from << 10) | (to << 4) | flags.
+Move-objects are created by the caller.
+"""
+
+# Local imports
+from magics import MASK_64, bishop_attacks, rook_attacks
+from move import DOUBLE_PUSH, EN_PASSANT, QUIET
+
+FILE_A = sum(1 << (row_no * 8) for row_no in range(8))
+FILE_H = FILE_A << 7
+# The rows a pawn lands on after its first single step
+WHITE_PUSH_ROW = 0xFF << 40
+BLACK_PUSH_ROW = 0xFF << 16
+
+
+def build_attack_table(offsets):
+	"""Builds a bitboard of target squares for every square, given a list of (row, col) offsets"""
+	table = []
+	for sq in range(64):
+		row_no, col_no = divmod(sq, 8)
+		targets = 0
+		for d_row, d_col in offsets:
+			if 0 <= row_no + d_row < 8 and 0 <= col_no + d_col < 8:
+				targets |= 1 << ((row_no + d_row) * 8 + col_no + d_col)
+		table.append(targets)
+	return table
+
+
+# Precomputed knight and king targets from every square, already masked against the board edges
+KNIGHT_ATTACKS = build_attack_table(((2, 1), (2, -1), (1, 2), (1, -2), (-2, 1), (-2, -1), (-1, 2), (-1, -2)))
+KING_ATTACKS = build_attack_table(((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)))
+# Squares attacked by a pawn of the given colour from every square
+WHITE_PAWN_ATTACKS = build_attack_table(((-1, -1), (-1, 1)))
+BLACK_PAWN_ATTACKS = build_attack_table(((1, -1), (1, 1)))
+
+
+def iter_bits(bb):
+	"""
+	Yields the index of every set bit, lowest first.
+	Hot loops inline the same steps, as the generator costs a call per bit.
+	"""
+	while bb:
+		lsb = bb & -bb
+		yield lsb.bit_length() - 1
+		bb ^= lsb
+
+
+def append_pawn_moves(targets, offset, flags, moves):
+	"""Appends a move for every target square, the pawn moving stands offset squares away from its target"""
+	while targets:
+		lsb = targets & -targets
+		to = lsb.bit_length() - 1
+		targets ^= lsb
+		moves.append(((to + offset) << 10) | (to << 4) | flags)
+
+
+def generate_moves(bb, occ_w, occ_b, white, ep_sq, moves):
+	"""
+	Appends all pseudo-legal moves for one side, except castling, to moves.
+	bb maps piece names to bitboards, ep_sq is the en passant target square or -1.
+	"""
+	colour, ally, enemy = ("w", occ_w, occ_b) if white else ("b", occ_b, occ_w)
+	occ = occ_w | occ_b
+	empty = ~occ & MASK_64
+
+	# Pawns are handled all at once, by shifting the whole set
+	pawns = bb[colour + "P"]
+	if white:
+		single = (pawns >> 8) & empty
+		append_pawn_moves(single, 8, QUIET, moves)
+		append_pawn_moves(((single & WHITE_PUSH_ROW) >> 8) & empty, 16, DOUBLE_PUSH, moves)
+		append_pawn_moves((pawns >> 9) & ~FILE_H & enemy, 9, QUIET, moves)
+		append_pawn_moves((pawns >> 7) & ~FILE_A & enemy, 7, QUIET, moves)
+		ep_attackers = BLACK_PAWN_ATTACKS
+	else:
+		single = (pawns << 8) & empty
+		append_pawn_moves(single, -8, QUIET, moves)
+		append_pawn_moves(((single & BLACK_PUSH_ROW) << 8) & empty, -16, DOUBLE_PUSH, moves)
+		append_pawn_moves((pawns << 7) & ~FILE_H & enemy, -7, QUIET, moves)
+		append_pawn_moves((pawns << 9) & ~FILE_A & enemy, -9, QUIET, moves)
+		ep_attackers = WHITE_PAWN_ATTACKS
+	if ep_sq >= 0:
+		# Our pawns that attack the en passant square, found by looking back from it as the opposite colour
+		pawns &= ep_attackers[ep_sq]
+		while pawns:
+			lsb = pawns & -pawns
+			start = lsb.bit_length() - 1
+			pawns ^= lsb
+			moves.append((start << 10) | (ep_sq << 4) | EN_PASSANT)
+
+	not_ally = ~ally
+	for piece in ("N", "B", "R", "Q", "K"):
+		pieces = bb[colour + piece]
+		while pieces:
+			lsb = pieces & -pieces
+			start = lsb.bit_length() - 1
+			pieces ^= lsb
+			if piece == "N":
+				targets = KNIGHT_ATTACKS[start]
+			elif piece == "B":
+				targets = bishop_attacks(start, occ)
+			elif piece == "R":
+				targets = rook_attacks(start, occ)
+			elif piece == "Q":
+				targets = rook_attacks(start, occ) | bishop_attacks(start, occ)
+			else:
+				targets = KING_ATTACKS[start]
+			targets &= not_ally
+			while targets:
+				lsb = targets & -targets
+				to = lsb.bit_length() - 1
+				targets ^= lsb
+				moves.append((start << 10) | (to << 4) | QUIET)
+	return moves
@@ -0,0 +1,187 @@
+"""
+Finds the best move in a game state.
+Negamax alpha-beta search with iterative deepening and move ordering.
+"""
+
+import time
+
+import numpy as np
+
+# Local imports
+from engine import GameState
+from move import Move
+
+PIECE_VALUES = {"P": 100, "N": 320, "B": 330, "R": 500, "Q": 900, "K": 0}
+MATE_SCORE = 100000
+INFINITY = MATE_SCORE + 1
+MAX_PLY = 64
+# How many nodes to search between checks of the clock
+TIME_CHECK_INTERVAL = 1024
+
+# Transposition table entries, one flat buffer of fixed-size records
+TT_SIZE = 1 << 20
+TT_ENTRY = np.dtype([("key", "u8"), ("depth", "i1"), ("score", "i4"), ("flag", "u1"), ("best", "u2")])
+# What the stored score says about the real score
+EXACT, LOWER, UPPER = 1, 2, 3
+
+
+class SearchTimeout(Exception):
+	"""Raised inside the search when the time budget is spent"""
+
+
+def score_to_tt(score, ply):
+	"""Mate scores count plies from the root, the table stores them as plies from the position itself"""
+	if score >= MATE_SCORE - MAX_PLY:
+		return score + ply
+	if score <= -MATE_SCORE + MAX_PLY:
+		return score - ply
+	return score
+
+
+def score_from_tt(score, ply):
+	"""Reverses score_to_tt for a position reached at ply"""
+	if score >= MATE_SCORE - MAX_PLY:
+		return score - ply
+	if score <= -MATE_SCORE + MAX_PLY:
+		return score + ply
+	return score
+
+
+def evaluate(gs: GameState):
+	"""Scores a position by material, from the point of view of the player to move"""
+	score = 0
+	for piece, value in PIECE_VALUES.items():
+		score += value * (gs.bb["w" + piece].bit_count() - gs.bb["b" + piece].bit_count())
+	return score if gs.white_move else -score
+
+
+class Search():
+	"""Class holding the state of a search: transposition table, move ordering tables, principal variation and time budget."""
+	def __init__(self, time_limit=5.0, max_depth=MAX_PLY, tt_size=TT_SIZE):
+		self.time_limit = time_limit
+		self.max_depth = max_depth
+		# Indexed by the low bits of the Zobrist hash, so the size has to be a power of two
+		self.tt = np.zeros(tt_size, dtype=TT_ENTRY)
+		self.tt_mask = tt_size - 1
+		# Two quiet moves per ply that caused a beta-cutoff
+		self.killers = [[None, None] for _ in range(MAX_PLY)]
+		# Depth-weighted count of beta-cutoffs per move_id
+		self.history = [0] * (1 << 16)
+		# Principal variation of the last iteration, and the one being built
+		self.prev_pv = []
+		self.pv = [[] for _ in range(MAX_PLY + 1)]
+		self.nodes = 0
+		self.deadline = 0
+
+	def find_best_move(self, gs: GameState):
+		"""Searches with increasing depth until max_depth or the time limit is reached. Returns the best move, or None without moves."""
+		# Move generation in the search sets these flags for the positions it visits
+		checkmate, stalemate = gs.checkmate, gs.stalemate
+		self.deadline = time.perf_counter() + self.time_limit
+		self.nodes = 0
+		moves = gs.get_valid_moves()
+		best_move = moves[0] if moves else None
+		try:
+			for depth in range(1, self.max_depth + 1):
+				score = self.negamax(gs, depth, -INFINITY, INFINITY)
+				self.prev_pv = self.pv[0]
+				if self.prev_pv:
+					best_move = self.prev_pv[0]
+				# No point searching deeper once a forced mate is found
+				if abs(score) >= MATE_SCORE - MAX_PLY:
+					break
+		except SearchTimeout:
+			pass
+		gs.checkmate, gs.stalemate = checkmate, stalemate
+		return best_move
+
+	def negamax(self, gs: GameState, depth, alpha, beta, ply=0):
+		"""Returns the score of the position for the player to move, searching depth plies ahead"""
+		self.nodes += 1
+		if self.nodes % TIME_CHECK_INTERVAL == 0 and time.perf_counter() > self.deadline:
+			raise SearchTimeout()
+		self.pv[ply] = []
+		key = gs.zobrist
+		index = key & self.tt_mask
+		entry = self.tt[index]
+		tt_move = 0
+		if entry["key"] == key:
+			tt_move = int(entry["best"])
+			# The root always searches, so a best move and principal variation are found
+			if ply > 0 and entry["depth"] >= depth:
+				score = score_from_tt(int(entry["score"]), ply)
+				flag = entry["flag"]
+				if flag == EXACT:
+					return score
+				if flag == LOWER:
+					alpha = max(alpha, score)
+				elif flag == UPPER:
+					beta = min(beta, score)
+				if alpha >= beta:
+					return score
+
+		if depth == 0 or ply >= MAX_PLY:
+			# Leaves only need to know whether a move exists, so the packed moves are enough
+			if not gs.remove_selfchecks_raw(gs.get_possible_moves_raw()):
+				return -MATE_SCORE + ply if gs.in_check() else 0
+			return evaluate(gs)
+		moves = gs.get_valid_moves()
+		if not moves:
+			# Prefer the quickest mate, and the slowest way of getting mated
+			return -MATE_SCORE + ply if gs.checkmate else 0
+
+		alpha_start = alpha
+		best_move = 0
+		for move in self.order_moves(moves, ply, tt_move):
+			gs.make_move(move)
+			try:
+				score = -self.negamax(gs, depth - 1, -beta, -alpha, ply + 1)
+			finally:
+				gs.undo_move()
+			if score > alpha:
+				alpha = score
+				best_move = move.move_id
+				self.pv[ply] = [move] + self.pv[ply + 1]
+			if alpha >= beta:
+				if not move.piece_captured:
+					self.store_killer(move, ply)
+					self.history[move.move_id] += depth * depth
+				break
+
+		if alpha >= beta:
+			flag = LOWER
+		elif alpha > alpha_start:
+			flag = EXACT
+		else:
+			flag = UPPER
+		self.tt[index] = (key, depth, score_to_tt(alpha, ply), flag, best_move)
+		return alpha
+
+	def store_killer(self, move: Move, ply):
+		"""Remembers a quiet move that caused a cutoff, keeping the two most recent ones"""
+		killers = self.killers[ply]
+		if move != killers[0]:
+			killers[1] = killers[0]
+			killers[0] = move
+
+	def order_moves(self, moves, ply, tt_move=0):
+		"""
+		Sorts moves so the likely best are searched first: the move from the last principal variation,
+		the best move stored in the transposition table, then captures by most valuable victim and least valuable attacker, killer moves, and the rest by history.
+		"""
+		pv_move = self.prev_pv[ply] if ply < len(self.prev_pv) else None
+		killers = self.killers[ply]
+
+		def move_score(move):
+			if move == pv_move:
+				return 1 << 30
+			if move.move_id == tt_move:
+				return 1 << 29
+			if move.piece_captured:
+				return (1 << 24) + 10 * PIECE_VALUES[move.piece_captured[1]] - PIECE_VALUES[move.piece_moved[1]]
+			if move == killers[0] or move == killers[1]:
+				return 1 << 23
+			return min(self.history[move.move_id], (1 << 23) - 1)
+
+		# Sorting returns a new list, the move list itself is shared with the move cache
+		return sorted(moves, key=move_score, reverse=True)